@@ -3,20 +3,27 @@
 from __future__ import annotations
 
 import os
+import threading
 from datetime import datetime, timedelta, timezone
 from typing import Optional
 
+import anyio
 import jwt
+import requests
+from cachetools import TTLCache
 from fastapi import Depends, HTTPException, status
 from fastapi.security import HTTPAuthorizationCredentials, HTTPBearer
 from google.auth.transport import requests as google_requests
 from google.oauth2 import id_token
-from pydantic import BaseModel
+from pydantic import BaseModel, ConfigDict
+from requests.adapters import HTTPAdapter
 
 
 class AuthenticatedUser(BaseModel):
     """Minimal user profile stored in access tokens."""
 
+    model_config = ConfigDict(frozen=True)
+
     sub: str
     email: str
     name: Optional[str] = None
@@ -33,12 +40,58 @@ JWT_SECRET = os.getenv("JWT_SECRET", "change-me")
 JWT_ALGORITHM = os.getenv("JWT_ALGORITHM", "HS256")
 JWT_EXP_MINUTES = int(os.getenv("JWT_EXP_MINUTES", "1440"))
 
-_google_request = google_requests.Request()
+GOOGLE_CERTS_CACHE_TTL_SECONDS = 300
+
+
+class _CachingGoogleRequest(google_requests.Request):
+    """Transport that reuses Google's signing certs between verifications."""
+
+    def __init__(self, session: requests.Session, ttl: int) -> None:
+        super().__init__(session=session)
+        self._cache: TTLCache = TTLCache(maxsize=8, ttl=ttl)
+        self._lock = threading.Lock()
+
+    def __call__(self, url, method="GET", **kwargs):
+        if method != "GET":
+            return super().__call__(url, method=method, **kwargs)
+        with self._lock:
+            cached = self._cache.get(url)
+        if cached is not None:
+            return cached
+        response = super().__call__(url, method=method, **kwargs)
+        if response.status == 200:
+            with self._lock:
+                self._cache[url] = response
+        return response
+
+
+def _build_google_session() -> requests.Session:
+    session = requests.Session()
+    adapter = HTTPAdapter(pool_connections=10, pool_maxsize=10)
+    session.mount("https://", adapter)
+    return session
+
+
+_google_request = _CachingGoogleRequest(
+    _build_google_session(), GOOGLE_CERTS_CACHE_TTL_SECONDS
+)
+
+
 _bearer_scheme = HTTPBearer(auto_error=False)
 
+# Decoded tokens keyed by the raw bearer string; each entry also records the
+# token's own expiry so a cached token is never accepted past its lifetime.
+TOKEN_CACHE_TTL_SECONDS = 60
+_token_cache: TTLCache = TTLCache(maxsize=10_000, ttl=TOKEN_CACHE_TTL_SECONDS)
+_token_cache_lock = threading.Lock()
 
-def verify_google_credential(credential: str) -> AuthenticatedUser:
-    """Validate a Google ID token and return the associated user profile."""
+
+async def verify_google_credential(credential: str) -> AuthenticatedUser:
+    """Validate a Google ID token and return the associated user profile.
+
+    Verification runs in a worker thread so the cert fetch and RSA check
+    do not block the event loop.
+    """
 
     try:
         if not CLIENT_ID:
@@ -47,8 +100,8 @@ def verify_google_credential(credential: str) -> AuthenticatedUser:
                 detail="GOOGLE_CLIENT_ID is not configured",
             )
 
-        payload = id_token.verify_oauth2_token(
-            credential, _google_request, CLIENT_ID
+        payload = await anyio.to_thread.run_sync(
+            id_token.verify_oauth2_token, credential, _google_request, CLIENT_ID
         )
     except HTTPException:
         raise
@@ -89,6 +142,15 @@ def create_access_token(user: AuthenticatedUser) -> str:
 def decode_access_token(token: str) -> AuthenticatedUser:
     """Decode and validate a previously issued access token."""
 
+    with _token_cache_lock:
+        cached = _token_cache.get(token)
+    if cached is not None:
+        user, expires_at = cached
+        if expires_at > _now_utc().timestamp():
+            return user
+        with _token_cache_lock:
+            _token_cache.pop(token, None)
+
     try:
         payload = jwt.decode(token, JWT_SECRET, algorithms=[JWT_ALGORITHM])
     except jwt.ExpiredSignatureError as exc:  # type: ignore[attr-defined]
@@ -111,7 +173,11 @@ def decode_access_token(token: str) -> AuthenticatedUser:
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="Malformed token payload",
         )
-    return AuthenticatedUser(**user_data)
+    user = AuthenticatedUser(**user_data)
+    if "exp" in payload:
+        with _token_cache_lock:
+            _token_cache[token] = (user, payload["exp"])
+    return user
 
 
 def get_current_user(
@@ -119,6 +185,8 @@ def get_current_user(
 ) -> AuthenticatedUser:
     """FastAPI dependency to retrieve the authenticated user from Authorization header."""
 
+    # HTTPBearer(auto_error=True) would answer 403 here on this FastAPI;
+    # the frontend relies on 401 to log the user out.
     if credentials is None:
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
@@ -1,11 +1,42 @@
+import math
+from datetime import datetime, timedelta, timezone
+
 import firebase_admin
-from firebase_admin import credentials, firestore
+from firebase_admin import credentials, firestore, firestore_async
 
 if not firebase_admin._apps:
     cred = credentials.Certificate("firebase_key/gwallet-180a9-firebase-adminsdk-fbsvc-c1fbf88538.json")
     firebase_admin.initialize_app(cred)
 
 db = firestore.client()
+async_db = firestore_async.client()
+
+# Collection references are built once; callers derive document refs from them.
+RECEIPTS = db.collection("receipts")
+ASYNC_RECEIPTS = async_db.collection("receipts")
+EXTRACTION_CACHE = async_db.collection("extraction_cache")
+
+# Receipt fields returned to clients; anything else stays on the server.
+RECEIPT_FIELDS = [
+    "type_of_purchase",
+    "establishment_name",
+    "date",
+    "total",
+    "created_at",
+    "user_sub",
+    "items",
+]
+RECEIPTS_PAGE_SIZE = 50
+EXTRACTION_CACHE_MAX_AGE = timedelta(days=30)
+
+
+def to_number(value, default=0.0):
+    """Coerce a posted or stored numeric field to float, or return default."""
+    try:
+        number = float(value)
+    except (TypeError, ValueError):
+        return default
+    return number if math.isfinite(number) else default
 
 
 def normalize_receipt(raw_data):
@@ -14,15 +45,15 @@ def normalize_receipt(raw_data):
         "type_of_purchase": raw_data.get("type_of_purchase", "Retail"),
         "establishment_name": raw_data.get("establishment_name", "Unknown Store"),
         "date": raw_data.get("date", ""),
-        "total": raw_data.get("total", 0),
+        "total": to_number(raw_data.get("total", 0)),
         "items": [],
     }
 
     for item in raw_data.get("items", []):
         receipt["items"].append({
             "name": item.get("item_name") or item.get("name", "Unknown"),  # Check both fields
-            "price": item.get("price", 0),
-            "quantity": item.get("quantity", 1),
+            "price": to_number(item.get("price", 0)),
+            "quantity": int(to_number(item.get("quantity", 1), 1)),
         })
     return receipt
 
@@ -30,19 +61,19 @@ def insert_data(receipt_data, user_id):
     """Save a new receipt to Firestore."""
     try:
         receipt = normalize_receipt(receipt_data)
-        doc_ref = db.collection("receipts").add({
+        # Items are small and always read with their receipt, so they are
+        # stored on the receipt document itself rather than a subcollection.
+        doc_ref = RECEIPTS.add({
             "user_sub": user_id,
             "type_of_purchase": receipt["type_of_purchase"],
             "establishment_name": receipt["establishment_name"],
             "date": receipt["date"],
             "total": receipt["total"],
+            "items": receipt["items"],
             "created_at": firestore.SERVER_TIMESTAMP,
-        })[0]
+        })[1]
         receipt_id = doc_ref.id
 
-        for item in receipt["items"]:
-            db.collection("receipts").document(receipt_id).collection("items").add(item)
-
         print(f"Receipt saved to Firestore: {receipt_id}")
         return receipt_id
     except Exception as e:
@@ -65,33 +96,67 @@ def insert_data(receipt_data, user_id):
 #         receipts.append(data)
 
 #     return receipts
-def get_all_receipts(user_id):
-    """Fetch all receipts + their items from Firestore."""
+async def get_all_receipts(user_id, page_size=RECEIPTS_PAGE_SIZE, start_after_id=None):
+    """Fetch a page of the user's receipts + their items from Firestore.
+
+    Returns ``{"receipts": [...], "next_cursor": id}``; pass ``next_cursor``
+    back as ``start_after_id`` for the following page. ``next_cursor`` is
+    None once the last page has been read, and an empty page is returned
+    if ``start_after_id`` is not one of the user's receipts.
+    ``page_size=None`` reads the user's full history in one query.
+    """
     # receipts_ref = db.collection("receipts").order_by("created_at", direction=firestore.Query.DESCENDING)
     receipts_ref = (
-        db.collection("receipts")
+        ASYNC_RECEIPTS
         .where("user_sub", "==", user_id)
+        .select(RECEIPT_FIELDS)
         .order_by("created_at", direction=firestore.Query.DESCENDING)
     )
-    docs = receipts_ref.stream()
-    receipts = []
-
-    for doc in docs:
-        data = doc.to_dict()
-        items_ref = db.collection("receipts").document(doc.id).collection("items")
-        
-        # Map item_name to name for consistency
-        items = []
-        for i in items_ref.stream():
-            item_data = i.to_dict()
-            items.append({
-                "name": item_data.get("item_name", item_data.get("name", "Unknown")),
-                "price": item_data.get("price", 0),
-                "quantity": item_data.get("quantity", 1)
-            })
-        
-        data["items"] = items
-        data["id"] = doc.id
-        receipts.append(data)
-
-    return receipts
\ No newline at end of file
+    if page_size is not None:
+        receipts_ref = receipts_ref.limit(page_size)
+    if start_after_id:
+        cursor = await ASYNC_RECEIPTS.document(start_after_id).get()
+        # An unknown or foreign cursor ends the listing; restarting from the
+        # first page would make "load more" append duplicates.
+        if not cursor.exists or cursor.get("user_sub") != user_id:
+            return {"receipts": [], "next_cursor": None}
+        receipts_ref = receipts_ref.start_after(cursor)
+
+    receipts = {doc.id: doc.to_dict() async for doc in receipts_ref.stream()}
+
+    for receipt_id, data in receipts.items():
+        data.setdefault("items", [])
+        data["id"] = receipt_id
+
+    next_cursor = next(reversed(receipts)) if page_size and len(receipts) == page_size else None
+    return {"receipts": list(receipts.values()), "next_cursor": next_cursor}
+
+
+async def get_cached_extraction(key):
+    """Return the stored extraction payload for a cache key, if still fresh.
+
+    Lookup failures are treated as a miss so extraction can go ahead.
+    """
+    try:
+        snapshot = await EXTRACTION_CACHE.document(key).get()
+    except Exception as e:
+        print("Error reading extraction cache:", e)
+        return None
+    if not snapshot.exists:
+        return None
+    data = snapshot.to_dict()
+    created_at = data.get("created_at")
+    if created_at is None or datetime.now(timezone.utc) - created_at > EXTRACTION_CACHE_MAX_AGE:
+        return None
+    return data["payload"]
+
+
+async def cache_extraction(key, payload):
+    """Remember the extraction payload under a cache key."""
+    try:
+        await EXTRACTION_CACHE.document(key).set({
+            "payload": payload,
+            "created_at": firestore.SERVER_TIMESTAMP,
+        })
+    except Exception as e:
+        print("Error caching extraction:", e)
@@ -76,6 +76,7 @@ function App() {
   const [formData, setFormData] = useState(DEFAULT_RECEIPT);
   const [saving, setSaving] = useState(false);
   const [receipts, setReceipts] = useState([]);
+  const [receiptsCursor, setReceiptsCursor] = useState(null);
   const [receiptsError, setReceiptsError] = useState('');
   const [loadingReceipts, setLoadingReceipts] = useState(false);
   const [walletLoading, setWalletLoading] = useState({});
@@ -147,9 +148,12 @@ function App() {
     [handleLogout, showMessage],
   );
 
-  const loadReceipts = useCallback(async () => {
+  // Without a cursor the list is reloaded from the newest receipt; with one,
+  // the next page is appended.
+  const loadReceipts = useCallback(async (cursor) => {
     if (!isAuthenticated) {
       setReceipts([]);
+      setReceiptsCursor(null);
       setReceiptsError('');
       return;
     }
@@ -157,9 +161,11 @@ function App() {
     setLoadingReceipts(true);
     setReceiptsError('');
     try {
-      const response = await fetchReceipts();
+      const response = await fetchReceipts(cursor);
       if (response?.status === 'success') {
-        setReceipts(response.data ?? []);
+        const page = response.data ?? [];
+        setReceipts((prev) => (cursor ? [...prev, ...page] : page));
+        setReceiptsCursor(response.next_cursor ?? null);
       } else {
         throw new Error(response?.message || 'Failed to load receipts');
       }
@@ -361,10 +367,19 @@ function App() {
     setChatInput('');
     setChatHistory((prev) => [...prev, { role: 'user', text: prompt }]);
     setChatLoading(true);
+    // The first chunk appends the assistant message; later chunks replace it.
+    let streaming = false;
+    const showReply = (text) => {
+      const append = !streaming;
+      streaming = true;
+      setChatHistory((prev) => [
+        ...(append ? prev : prev.slice(0, -1)),
+        { role: 'assistant', text },
+      ]);
+    };
     try {
-      const response = await askReceiptAssistant(prompt);
-      const reply = response?.reply || 'No response received.';
-      setChatHistory((prev) => [...prev, { role: 'assistant', text: reply }]);
+      const response = await askReceiptAssistant(prompt, { onDelta: showReply });
+      showReply(response?.reply || 'No response received.');
     } catch (error) {
       if (error?.status === 401) {
         handleApiError(error, 'Assistant unavailable.');
@@ -574,7 +589,7 @@ function App() {
           <section className="card">
             <div className="card-header">
               <h2>Saved Receipts</h2>
-              <button type="button" className="secondary" onClick={loadReceipts} disabled={loadingReceipts}>
+              <button type="button" className="secondary" onClick={() => loadReceipts()} disabled={loadingReceipts}>
                 {loadingReceipts ? 'Refreshing…' : 'Refresh'}
               </button>
             </div>
@@ -624,6 +639,16 @@ function App() {
                 </article>
               ))}
             </div>
+            {receiptsCursor && (
+              <button
+                type="button"
+                className="secondary"
+                onClick={() => loadReceipts(receiptsCursor)}
+                disabled={loadingReceipts}
+              >
+                {loadingReceipts ? 'Loading…' : 'Load more'}
+              </button>
+            )}
           </section>
         )}
 
@@ -1,6 +1,6 @@
 const API_BASE_URL = import.meta.env.VITE_API_BASE_URL || 'http://localhost:8000';
 
-async function request(path, options = {}) {
+function authorizedFetch(path, options = {}) {
   const headers = new Headers(options.headers || {});
 
   if (typeof window !== 'undefined') {
@@ -10,10 +10,14 @@ async function request(path, options = {}) {
     }
   }
 
-  const response = await fetch(`${API_BASE_URL}${path}`, {
+  return fetch(`${API_BASE_URL}${path}`, {
     ...options,
     headers,
   });
+}
+
+async function request(path, options = {}) {
+  const response = await authorizedFetch(path, options);
   const contentType = response.headers.get('content-type') || '';
 
   let data;
@@ -51,8 +55,9 @@ export async function saveReceipt(payload) {
   });
 }
 
-export async function fetchReceipts() {
-  return request('/receipts', {
+export async function fetchReceipts(cursor) {
+  const query = cursor ? `?cursor=${encodeURIComponent(cursor)}` : '';
+  return request(`/receipts${query}`, {
     method: 'GET',
   });
 }
@@ -63,12 +68,51 @@ export async function saveReceiptToWallet(receiptId) {
   });
 }
 
-export async function askReceiptAssistant(prompt) {
-  return request('/llm-receipt', {
+export async function askReceiptAssistant(prompt, { onDelta } = {}) {
+  const options = {
     method: 'POST',
     headers: { 'Content-Type': 'application/json' },
     body: JSON.stringify({ prompt }),
-  });
+  };
+  const response = await authorizedFetch('/llm-receipt', options);
+  const contentType = response.headers.get('content-type') || '';
+
+  if (!response.ok || !contentType.includes('text/event-stream')) {
+    const data = contentType.includes('application/json') ? await response.json() : await response.text();
+    if (!response.ok) {
+      const message = typeof data === 'string' ? data : data?.message || data?.detail || 'Unexpected error';
+      const error = new Error(message);
+      error.status = response.status;
+      throw error;
+    }
+    return data;
+  }
+
+  // Server-Sent Events: each "data:" line carries {"delta": text} or {"error": message}.
+  const reader = response.body.getReader();
+  const decoder = new TextDecoder();
+  let buffer = '';
+  let reply = '';
+
+  for (;;) {
+    const { done, value } = await reader.read();
+    if (done) break;
+    buffer += decoder.decode(value, { stream: true });
+
+    const events = buffer.split('\n\n');
+    buffer = events.pop();
+    for (const event of events) {
+      if (!event.startsWith('data: ')) continue;
+      const payload = JSON.parse(event.slice('data: '.length));
+      if (payload.error) {
+        throw new Error(payload.error);
+      }
+      reply += payload.delta || '';
+      onDelta?.(reply);
+    }
+  }
+
+  return { reply };
 }
 
 export async function loginWithGoogle(credential) {
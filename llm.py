@@ -4,22 +4,20 @@ from google.genai import types
 from dotenv import load_dotenv
 from pydantic import BaseModel, Field
 from langchain_core.output_parsers import PydanticOutputParser
-from typing import Optional, Literal, Union, List, Dict
-import json
+from typing import AsyncIterator, Optional, Literal, Union, List, Dict
+import hashlib
+import heapq
 import os
 
-import firebase_admin
-from firebase_admin import credentials, firestore
+import orjson
+from cachetools import TTLCache
+
+from fbase import ASYNC_RECEIPTS, to_number
 
 load_dotenv()
 API_KEY = os.getenv("GOOGLE_API_KEY")
 client = genai.Client(api_key=API_KEY)
 
-if not firebase_admin._apps:
-    cred = credentials.Certificate("firebase_key/gwallet-180a9-firebase-adminsdk-fbsvc-c1fbf88538.json")
-    firebase_admin.initialize_app(cred)
-db = firestore.client()
-
 class Item(BaseModel):
     name: str
     price: float
@@ -36,6 +34,10 @@ class Receipt(BaseModel):
 
 parser = PydanticOutputParser(pydantic_object=Receipt)
 
+_receipts_json_cache: TTLCache = TTLCache(maxsize=1000, ttl=30)
+EXTRACTION_MODEL = "gemini-2.5-flash-lite"
+PROMPT_ITEMS_PER_RECEIPT = 3
+
 def build_extraction_prompt(image_path, format_instruction: str) -> str:
     return f"""
 You are a receipt text extractor assistant. 
@@ -51,19 +53,68 @@ IMPORTANT:
 """
 
 
-def build_chat_prompt(user_prompt: str, firebase_data: List[Dict]) -> str:
+# Changes whenever the extraction model or prompt does, so cached
+# extractions from an older setup are not reused.
+EXTRACTION_VERSION = hashlib.sha256(
+    f"{EXTRACTION_MODEL}\n{build_extraction_prompt(None, parser.get_format_instructions())}".encode()
+).hexdigest()[:12]
+
+
+def _project_receipt(receipt: Dict) -> Dict:
+    """Trim a receipt to the fields the chat model needs, under short keys."""
+    # Receipts saved before prices were coerced on write may hold strings.
+    items = []
+    for item in receipt.get("items", []):
+        price = to_number(item.get("price"))
+        quantity = to_number(item.get("quantity", 1), 1)
+        if price > 0 and quantity > 0:
+            items.append({"n": item.get("name"), "p": price, "q": quantity})
+    top_items = heapq.nlargest(
+        PROMPT_ITEMS_PER_RECEIPT, items, key=lambda item: item["p"] * item["q"]
+    )
+    return {
+        "e": receipt.get("establishment_name"),
+        "k": receipt.get("type_of_purchase"),
+        "d": receipt.get("date"),
+        "t": receipt.get("total"),
+        "i": top_items,
+    }
+
+
+def _dump_receipts(firebase_data: List[Dict]) -> str:
+    return orjson.dumps([_project_receipt(r) for r in firebase_data], default=str).decode()
+
+
+def serialize_receipts(firebase_data: List[Dict], user_sub: Optional[str] = None) -> str:
+    """
+    Serialize receipts for the chat prompt, reusing the cached string while the
+    user's receipts are unchanged (same count and newest created_at).
+    """
+    if user_sub is None:
+        return _dump_receipts(firebase_data)
+
+    latest = max((r.get("created_at") for r in firebase_data if r.get("created_at")), default=None)
+    key = (user_sub, latest, len(firebase_data))
+    cached = _receipts_json_cache.get(key)
+    if cached is None:
+        cached = _receipts_json_cache[key] = _dump_receipts(firebase_data)
+    return cached
+
+
+def build_chat_prompt(user_prompt: str, firebase_data: List[Dict], user_sub: Optional[str] = None) -> str:
     """
     Create a chat prompt for Gemini that gives the LLM context
     about stored receipts in Firebase.
     """
-    receipts_json = json.dumps(firebase_data, indent=2)
+    receipts_json = serialize_receipts(firebase_data, user_sub)
     return f"""
 You are an intelligent financial assistant. You have access to the user's past receipts stored in Firebase.
 
 User prompt:
 {user_prompt}
 
-Here is the list of receipts from Firebase:
+Here is the list of receipts from Firebase. Keys: e = establishment, k = type of purchase,
+d = date, t = total, i = up to {PROMPT_ITEMS_PER_RECEIPT} largest items (n = name, p = unit price, q = quantity):
 {receipts_json}
 
 Your job:
@@ -73,74 +124,66 @@ Your job:
 - Do NOT output any JSON unless explicitly asked.
 """
 
-def fetch_all_receipts_from_firebase() -> List[Dict]:
+async def fetch_all_receipts_from_firebase() -> List[Dict]:
     """Retrieve all receipts and their items from Firestore."""
-    receipts_ref = db.collection("receipts")
-    snapshot = receipts_ref.stream()
-
     all_receipts = []
-    for doc in snapshot:
+    async for doc in ASYNC_RECEIPTS.stream():
         data = doc.to_dict()
-        items_ref = receipts_ref.document(doc.id).collection("items").stream()
-        items = [it.to_dict() for it in items_ref]
         data["id"] = doc.id
-        data["items"] = items
+        data.setdefault("items", [])
         for k, v in data.items():
             if hasattr(v, "isoformat"):
                 data[k] = v.isoformat()
         all_receipts.append(data)
     return all_receipts
 
-def llm_model(*args, **kwargs):
+async def extract_receipt_from_image(image: Union[bytes, str], mime_type: Optional[str] = None) -> Receipt:
+    """Extract structured receipt data from image bytes or an image file path."""
+    if isinstance(image, bytes):
+        image_part = types.Part.from_bytes(data=image, mime_type=mime_type or "image/jpeg")
+    else:
+        image_part = await client.aio.files.upload(file=image)
+    prompt = build_extraction_prompt(image, format_instruction=parser.get_format_instructions())
+
+    response = await client.aio.models.generate_content(
+        model=EXTRACTION_MODEL,
+        contents=[prompt, image_part],
+        config=types.GenerateContentConfig(
+            thinking_config=types.ThinkingConfig(thinking_budget=100)
+        ),
+    )
+
+    raw_text = response.candidates[0].content.parts[0].text
+    structured_response = parser.parse(raw_text)
+    return structured_response
+
+
+async def chat_with_receipts(
+    prompt: str,
+    receipts: Optional[List[Dict]] = None,
+    user_sub: Optional[str] = None,
+) -> AsyncIterator[str]:
     """
-    Universal model handler.
-    - If passed an image path -> extract structured data.
-    - If passed a prompt and receipts -> chat reasoning.
-    - If no receipts passed -> automatically fetch from Firebase.
+    Answer a user prompt using stored receipts as context, yielding the
+    reply text as Gemini streams it.
+    If no receipts are passed they are fetched from Firebase.
+    Passing user_sub lets the serialized receipts be reused across turns.
     """
-    if len(args) == 1 and isinstance(args[0], str) and args[0].lower().endswith((".jpg", ".jpeg", ".png")):
-        image_path = args[0]
-        uploaded_file = client.files.upload(file=image_path)
-        prompt = build_extraction_prompt(image_path, format_instruction=parser.get_format_instructions())
-
-        response = client.models.generate_content(
-            model="gemini-2.5-flash-lite",
-            contents=[prompt, uploaded_file],
-            config=types.GenerateContentConfig(
-                thinking_config=types.ThinkingConfig(thinking_budget=100)
-            ),
-        )
-
-        raw_text = response.candidates[0].content.parts[0].text
-        structured_response = parser.parse(raw_text)
-        return structured_response
-
-    elif len(args) >= 1 and isinstance(args[0], str):
-        prompt = args[0]
-        receipts = []
-        if len(args) > 1 and isinstance(args[1], list):
-            receipts = args[1]
-        else:
-            receipts = fetch_all_receipts_from_firebase()
-
-        chat_prompt = build_chat_prompt(prompt, receipts)
-        response = client.models.generate_content(
-            model="gemini-2.0-flash-thinking-exp",
-            contents=[chat_prompt],
-            config=types.GenerateContentConfig(
-                temperature=0.5,
-                thinking_config=types.ThinkingConfig(thinking_budget=100),
-            ),
-        )
-        return response.candidates[0].content.parts[0].text.strip()
-
-    else:
-        raise ValueError("Invalid llm_model call — must pass image_path or (prompt, [receipts])")
-
-# if __name__ == "__main__":
-#     print("Fetching receipts and asking Gemini...")
-#     reply = llm_model("Summarize my last 5 purchases.")
-#     print("LLM reply:", reply)
+    if receipts is None:
+        receipts = await fetch_all_receipts_from_firebase()
+
+    chat_prompt = build_chat_prompt(prompt, receipts, user_sub)
+    stream = await client.aio.models.generate_content_stream(
+        model="gemini-2.0-flash-thinking-exp",
+        contents=[chat_prompt],
+        config=types.GenerateContentConfig(
+            temperature=0.5,
+            thinking_config=types.ThinkingConfig(thinking_budget=100),
+        ),
+    )
+    async for chunk in stream:
+        if chunk.text:
+            yield chunk.text
 
 
 
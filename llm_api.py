@@ -1,19 +1,21 @@
 from fastapi import FastAPI, UploadFile, File, Request, HTTPException, Depends
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import ORJSONResponse, StreamingResponse
 from pydantic import BaseModel
-from llm import llm_model
-from fbase import insert_data, get_all_receipts
-import tempfile, shutil, logging, inspect, json
-from typing import Any
+from llm import EXTRACTION_VERSION, chat_with_receipts, extract_receipt_from_image
+from fbase import RECEIPTS, cache_extraction, get_all_receipts, get_cached_extraction, insert_data
+import asyncio, concurrent.futures, functools, hashlib, logging, os
+import anyio
+import orjson
+from typing import Any, Optional
 from main import create_wallet_object
-from firebase_admin import firestore
 from auth import (
     AuthenticatedUser,
     create_access_token,
     get_current_user,
     verify_google_credential,
 )
-app = FastAPI()
+app = FastAPI(default_response_class=ORJSONResponse)
 logging.basicConfig(level=logging.INFO)
 
 app.add_middleware(
@@ -25,24 +27,35 @@ app.add_middleware(
 )
 
 
+# Dedicated pool for blocking Firestore calls so they do not compete with
+# Starlette's shared threadpool.
+_fs_executor = concurrent.futures.ThreadPoolExecutor(
+    max_workers=min(32, (os.cpu_count() or 1) * 4),
+    thread_name_prefix="fs",
+)
+
+
+async def fs_call(fn, *args, **kwargs):
+    """Run a blocking Firestore call on the Firestore executor."""
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(_fs_executor, functools.partial(fn, *args, **kwargs))
+
+
+def _json_default(obj: Any):
+    """Encode types orjson does not handle, e.g. Firestore DatetimeWithNanoseconds."""
+    if hasattr(obj, "isoformat"):
+        return obj.isoformat()
+    return str(obj)
+
+
 def safe_json(obj: Any):
     """Safely serialize Firestore and custom Python objects."""
     try:
-        return json.loads(json.dumps(obj, default=str))
+        return orjson.loads(orjson.dumps(obj, default=_json_default))
     except Exception:
         return str(obj)
 
 
-async def call_llm_model(*args, **kwargs):
-    """Handle async/sync llm_model calls gracefully."""
-    if inspect.iscoroutinefunction(llm_model):
-        return await llm_model(*args, **kwargs)
-    result = llm_model(*args, **kwargs)
-    if inspect.isawaitable(result):
-        return await result
-    return result
-
-
 class GoogleAuthPayload(BaseModel):
     credential: str
 
@@ -51,7 +64,7 @@ class GoogleAuthPayload(BaseModel):
 async def google_auth(payload: GoogleAuthPayload):
     """Exchange Google ID token for an application JWT."""
 
-    user = verify_google_credential(payload.credential)
+    user = await verify_google_credential(payload.credential)
     token = create_access_token(user)
     return {
         "status": "success",
@@ -73,18 +86,22 @@ async def extract_receipt(
     file: UploadFile = File(...),
     current_user: AuthenticatedUser = Depends(get_current_user),
 ):
-    """Handle image upload and receipt extraction."""
+    """Handle image upload and receipt extraction.
+
+    Results are cached by extraction version and the SHA-256 of the image,
+    so re-uploading the same receipt skips the Gemini call.
+    """
     try:
-        with tempfile.NamedTemporaryFile(delete=False, suffix=".jpg") as tmp:
-            shutil.copyfileobj(file.file, tmp)
-            temp_path = tmp.name
-
-        result = await call_llm_model(temp_path)
-        payload = (
-            safe_json(result.model_dump())
-            if hasattr(result, "model_dump")
-            else safe_json(result)
-        )
+        data = await file.read()
+        cache_key = f"{EXTRACTION_VERSION}-{hashlib.sha256(data).hexdigest()}"
+
+        cached = await get_cached_extraction(cache_key)
+        if cached is not None:
+            return {"status": "success", "data": cached}
+
+        result = await extract_receipt_from_image(data, mime_type=file.content_type)
+        payload = safe_json(result.model_dump())
+        await cache_extraction(cache_key, payload)
         return {"status": "success", "data": payload}
     except Exception as e:
         logging.exception("extract_receipt failed")
@@ -99,7 +116,7 @@ async def save_receipt(
     """Save receipt data to Firebase."""
     try:
         data = await request.json()
-        receipt_id = insert_data(data, current_user.sub)
+        receipt_id = await fs_call(insert_data, data, current_user.sub)
         if receipt_id:
             return {"status": "success", "receipt_id": receipt_id}
         return {"status": "error", "message": "Failed to save"}
@@ -109,11 +126,21 @@ async def save_receipt(
 
 
 @app.get("/receipts")
-async def list_receipts(current_user: AuthenticatedUser = Depends(get_current_user)):
-    """Return all receipts stored in Firestore."""
+async def list_receipts(
+    cursor: Optional[str] = None,
+    current_user: AuthenticatedUser = Depends(get_current_user),
+):
+    """Return a page of the user's receipts stored in Firestore.
+
+    Pass the previous response's ``next_cursor`` as ``cursor`` to continue.
+    """
     try:
-        receipts = get_all_receipts(current_user.sub)
-        return {"status": "success", "data": safe_json(receipts)}
+        page = await get_all_receipts(current_user.sub, start_after_id=cursor)
+        return {
+            "status": "success",
+            "data": safe_json(page["receipts"]),
+            "next_cursor": page["next_cursor"],
+        }
     except Exception as e:
         logging.exception("list_receipts failed")
         raise HTTPException(status_code=500, detail=str(e))
@@ -125,25 +152,16 @@ async def save_to_wallet(
     current_user: AuthenticatedUser = Depends(get_current_user),
 ):
     try:
-        db = firestore.client()
-        doc_ref = db.collection("receipts").document(receipt_id)
-        doc = doc_ref.get()
+        doc_ref = RECEIPTS.document(receipt_id)
+        doc = await fs_call(doc_ref.get)
         if not doc.exists:
             return {"status": "error", "message": "Receipt not found"}
         receipt_data = doc.to_dict()
         if receipt_data.get("user_sub") != current_user.sub:
             return {"status": "error", "message": "Receipt not found"}
-        item_ref = doc_ref.collection("items")
-        items = [
-            {
-                "name": i.to_dict().get("item_name", "unknown"),
-                "price": i.to_dict().get("price", 0),
-                "quantity": i.to_dict().get("quantity", 1),
-            }
-            for i in item_ref.stream()
-        ]
-        receipt_data["items"] = items
-        save_url = create_wallet_object(receipt_data)
+        receipt_data.setdefault("items", [])
+        # Token refresh, retries and the wallet POST all block; keep them off the loop.
+        save_url = await anyio.to_thread.run_sync(create_wallet_object, receipt_data)
         if save_url:
             # return {"status":'success',"saveurl":save_url}
             return {"status": "success", "saveUrl": save_url}
@@ -165,21 +183,37 @@ async def llm_receipt(
 ):
     """
     Chat endpoint — LLM always accesses live Firebase receipts
-    and responds to the user’s prompt.
+    and streams its reply to the user’s prompt as Server-Sent Events.
+    Each event carries ``{"delta": text}``, or ``{"error": message}``
+    if generation fails part-way.
     """
     try:
-        body = await req.json()
-        prompt = body.get("prompt", "")
-
-        receipts = get_all_receipts(current_user.sub)
-        result = await call_llm_model(prompt, receipts)
-
-        if isinstance(result, dict):
-            reply = result.get("reply") or json.dumps(result)
-        else:
-            reply = str(result)
-
-        return {"reply": reply}
+        # Start the Firestore read before parsing the body so the two overlap.
+        # The assistant answers over the whole history, so read it unpaged.
+        receipts_task = asyncio.create_task(get_all_receipts(current_user.sub, page_size=None))
+        try:
+            body = await req.json()
+            prompt = body.get("prompt", "")
+        except Exception:
+            receipts_task.cancel()
+            raise
+
+        receipts = (await receipts_task)["receipts"]
     except Exception as e:
         logging.exception("llm_receipt failed")
         return {"reply": f"Error: {str(e)}"}
+
+    async def events():
+        try:
+            async for text in chat_with_receipts(prompt, receipts, current_user.sub):
+                yield b"data: " + orjson.dumps({"delta": text}) + b"\n\n"
+        except Exception as e:
+            logging.exception("llm_receipt stream failed")
+            yield b"data: " + orjson.dumps({"error": str(e)}) + b"\n\n"
+
+    # Stop proxies such as nginx from buffering the stream.
+    return StreamingResponse(
+        events(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
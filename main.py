@@ -1,11 +1,17 @@
 import firebase_admin
 from firebase_admin import credentials, firestore
 import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
 from google.oauth2 import service_account
 import google.auth.transport.requests
+from cryptography.hazmat.primitives import serialization
 import json
+import threading
 import time
 import jwt
+from datetime import datetime, timedelta, timezone
+from types import MappingProxyType
 
 # --- FIREBASE SETUP ---
 if not firebase_admin._apps:
@@ -19,30 +25,78 @@ SERVICE_ACCOUNT_FILE = "wallet-service-key.json"
 ISSUER_ID = "3388000000023012969"
 SCOPES = ["https://www.googleapis.com/auth/wallet_object.issuer"]
 
-credentials = service_account.Credentials.from_service_account_file(
-    SERVICE_ACCOUNT_FILE, scopes=SCOPES
+with open(SERVICE_ACCOUNT_FILE, "r") as f:
+    _service_account_info = json.load(f)
+
+# Parse the PEM once; loading it validates the RSA key, which is costly.
+SERVICE_ACCOUNT_EMAIL = _service_account_info["client_email"]
+_signing_key = serialization.load_pem_private_key(
+    _service_account_info["private_key"].encode(), password=None
+)
+
+credentials = service_account.Credentials.from_service_account_info(
+    _service_account_info, scopes=SCOPES
 )
 request = google.auth.transport.requests.Request()
 credentials.refresh(request)
+
+# Pooled session so wallet calls reuse the TLS connection to the API.
+_wallet_session = requests.Session()
+_wallet_session.mount(
+    "https://",
+    HTTPAdapter(
+        pool_connections=10,
+        pool_maxsize=10,
+        max_retries=Retry(total=3, backoff_factor=0.2),
+    ),
+)
 BASE_URL = "https://walletobjects.googleapis.com/walletobjects/v1"
 
+# Fields shared by every receipt object; create_wallet_object only adds
+# the per-receipt ones.
+_WALLET_TEMPLATE = MappingProxyType({
+    "classId": f"{ISSUER_ID}.receiptClass123",
+    "state": "ACTIVE",
+    "hexBackgroundColor": "#4285f4",
+    "logo": {
+        "sourceUri": {
+            "uri": "https://storage.googleapis.com/wallet-lab-tools-codelab-artifacts-public/pass_google_logo.jpg"
+        },
+        "contentDescription": {
+            "defaultValue": {"language": "en-US", "value": "Project Raseed Logo"}
+        },
+    },
+})
+
 # --- Helper Functions ---
-def create_jwt_save_url(object_payload):
-    with open(SERVICE_ACCOUNT_FILE, "r") as f:
-        service_account_info = json.load(f)
+_credentials_lock = threading.Lock()
+
 
+def _credentials_expiring():
+    # google-auth stores expiry as a naive UTC datetime.
+    now = datetime.now(timezone.utc).replace(tzinfo=None)
+    return credentials.expiry is None or credentials.expiry - now < timedelta(minutes=5)
+
+
+def _ensure_fresh_credentials():
+    """Refresh the wallet access token if it expires within five minutes."""
+    if not _credentials_expiring():
+        return
+    # Wallet calls run in worker threads; let only one of them refresh.
+    with _credentials_lock:
+        if _credentials_expiring():
+            credentials.refresh(request)
+
+
+def create_jwt_save_url(object_payload):
     claims = {
-        "iss": service_account_info["client_email"],
+        "iss": SERVICE_ACCOUNT_EMAIL,
         "aud": "google",
         "typ": "savetowallet",
         "payload": {"genericObjects": [object_payload]},
     }
 
-    token = jwt.encode(
-        claims,
-        service_account_info["private_key"],
-        algorithm="RS256",
-    )
+    token = jwt.encode(claims, _signing_key, algorithm="RS256")
     return f"https://pay.google.com/gp/v/save/{token}"
 
 
@@ -50,31 +104,17 @@ def create_wallet_object(receipt_data):
     """Create a Google Wallet object for a receipt."""
 
     items_text = "\n".join(
-    [
         f"{i.get('name', 'Unknown')}: ₹{i.get('price', 0)} x {i.get('quantity', 1)}"
         for i in receipt_data.get("items", [])
-    ]
-)
-
+    )
 
     object_id = f"{ISSUER_ID}.receiptObject{int(time.time())}"
 
-    object_payload = {
+    object_payload = _WALLET_TEMPLATE | {
         "id": object_id,
-        "classId": f"{ISSUER_ID}.receiptClass123",
-        "state": "ACTIVE",
         "cardTitle": {"defaultValue": {"language": "en-US", "value": receipt_data["establishment_name"]}},
         "header": {"defaultValue": {"language": "en-US", "value": f"{receipt_data['type_of_purchase']} Receipt"}},
         "subheader": {"defaultValue": {"language": "en-US", "value": receipt_data["date"]}},
-        "hexBackgroundColor": "#4285f4",
-        "logo": {
-            "sourceUri": {
-                "uri": "https://storage.googleapis.com/wallet-lab-tools-codelab-artifacts-public/pass_google_logo.jpg"
-            },
-            "contentDescription": {
-                "defaultValue": {"language": "en-US", "value": "Project Raseed Logo"}
-            },
-        },
         "textModulesData": [
             {"header": "Items Purchased", "body": items_text, "id": "items"},
             {"header": "Total Amount", "body": f"₹{receipt_data['total']}", "id": "total"},
@@ -91,7 +131,8 @@ def create_wallet_object(receipt_data):
         },
     }
 
-    response = requests.post(
+    _ensure_fresh_credentials()
+    response = _wallet_session.post(
         f"{BASE_URL}/genericObject",
         headers={"Authorization": f"Bearer {credentials.token}", "Content-Type": "application/json"},
         data=json.dumps(object_payload),
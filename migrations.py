@@ -0,0 +1,93 @@
+"""One-shot Firestore data migrations. Run with: python migrations.py <name>"""
+
+import sys
+
+from firebase_admin import firestore
+
+from fbase import RECEIPTS, db
+
+# Maximum number of writes a single Firestore batch may commit.
+BATCH_WRITE_LIMIT = 500
+
+
+def migrate_item_names():
+    """Rename legacy ``item_name`` fields on receipt items to ``name``."""
+    batch = db.batch()
+    pending = 0
+    migrated = 0
+
+    for item in db.collection_group("items").stream():
+        data = item.to_dict()
+        if "item_name" not in data:
+            continue
+        batch.update(item.reference, {
+            "name": data.get("name") or data["item_name"],
+            "item_name": firestore.DELETE_FIELD,
+        })
+        pending += 1
+        migrated += 1
+        if pending == BATCH_WRITE_LIMIT:
+            batch.commit()
+            batch = db.batch()
+            pending = 0
+
+    if pending:
+        batch.commit()
+    print(f"Migrated {migrated} items from item_name to name")
+
+
+def migrate_items_to_parent():
+    """Copy each receipt's ``items`` subcollection onto the receipt document.
+
+    The subcollection documents are deleted once they have been copied.
+    Receipts that already carry an ``items`` field are left untouched.
+    """
+    batch = db.batch()
+    pending = 0
+    migrated = 0
+
+    for receipt in RECEIPTS.stream():
+        if "items" in receipt.to_dict():
+            continue
+        snapshots = list(receipt.reference.collection("items").stream())
+        items = []
+        for i in snapshots:
+            data = i.to_dict()
+            items.append({
+                "name": data.get("name") or data.get("item_name", "Unknown"),
+                "price": data.get("price", 0),
+                "quantity": data.get("quantity", 1),
+            })
+
+        # Keep the update and its deletes in one batch where the limit allows,
+        # and always write the items before any of their sources are deleted.
+        if pending and pending + 1 + len(snapshots) > BATCH_WRITE_LIMIT:
+            batch.commit()
+            batch = db.batch()
+            pending = 0
+        batch.update(receipt.reference, {"items": items})
+        pending += 1
+        for i in snapshots:
+            if pending == BATCH_WRITE_LIMIT:
+                batch.commit()
+                batch = db.batch()
+                pending = 0
+            batch.delete(i.reference)
+            pending += 1
+        migrated += 1
+
+    if pending:
+        batch.commit()
+    print(f"Moved items onto {migrated} receipts")
+
+
+MIGRATIONS = {
+    "item_names": migrate_item_names,
+    "items_to_parent": migrate_items_to_parent,
+}
+
+
+if __name__ == "__main__":
+    if len(sys.argv) != 2 or sys.argv[1] not in MIGRATIONS:
+        sys.exit(f"usage: python migrations.py {{{'|'.join(MIGRATIONS)}}}")
+    MIGRATIONS[sys.argv[1]]()
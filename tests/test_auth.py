@@ -0,0 +1,40 @@
+"""Tests for the bearer-token dependency in auth.py."""
+
+from fastapi import Depends, FastAPI
+from fastapi.testclient import TestClient
+
+from auth import AuthenticatedUser, create_access_token, get_current_user
+
+app = FastAPI()
+
+
+@app.get("/me")
+def me(current_user: AuthenticatedUser = Depends(get_current_user)):
+    return current_user.model_dump()
+
+
+client = TestClient(app)
+
+
+def test_missing_authorization_header_returns_401():
+    response = client.get("/me")
+
+    assert response.status_code == 401
+    assert response.json() == {"detail": "Authorization header missing"}
+
+
+def test_valid_token_returns_user():
+    user = AuthenticatedUser(sub="user-1", email="user@example.com", name="User")
+    token = create_access_token(user)
+
+    response = client.get("/me", headers={"Authorization": f"Bearer {token}"})
+
+    assert response.status_code == 200
+    assert response.json() == user.model_dump()
+
+
+def test_invalid_token_returns_401():
+    response = client.get("/me", headers={"Authorization": "Bearer not-a-jwt"})
+
+    assert response.status_code == 401
+    assert response.json() == {"detail": "Invalid token"}